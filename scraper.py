@@ -7,13 +7,26 @@ error, ensuring the script can always save its data.
 """
 
 import httpx
+import aiohttp
+import aiofiles
+from httpx_aiohttp import AiohttpTransport
 import gspread
-import json
+import orjson
+import sqlite3
+import time
+from contextlib import closing
+import gzip
+import base64
 import os
 import re
 from datetime import datetime, timedelta
 import asyncio
-from bs4 import BeautifulSoup
+import itertools
+import operator
+from aiolimiter import AsyncLimiter
+import lxml.html
+from lxml import etree
+from lxml.cssselect import CSSSelector
 import traceback
 
 # --- FIX: Define Absolute Paths for Cron Job Reliability ---
@@ -24,12 +37,23 @@ GOOGLE_SHEETS_CREDENTIALS = os.path.join(SCRIPT_DIR, 'cred', 'eighth-jigsaw-4648
 GOOGLE_SHEET_NAME = 'My Scraped Data Sheet'
 MASTER_SHEET_NAME = 'MasterMovieDatabase'
 BASE_IMAGE_DIR = os.path.join(SCRIPT_DIR, 'downloaded_posters')
+DETAIL_CACHE_PATH = os.path.join(SCRIPT_DIR, 'cache.sqlite')
+MASTER_HEADERS = ['Movie Title', 'Movie URL', 'Description', 'Running Time (Minutes)', 'Release Date (YYYY-MM-DD)', 'Language', 'Genre', 'Distributor', 'Classification', 'Cast', 'Director', 'Format', 'Cinema Count', 'Poster URL', 'Local Poster Path', 'Aggregated Showtimes Data', 'Scrape Date']
+MASTER_SHEET_RANGE = f"'{MASTER_SHEET_NAME}'!A1:Q" # Columns A..Q hold the 17 headers
+MASTER_ROW_GETTER = operator.itemgetter(*MASTER_HEADERS)
+# Columns whose values repeat across many movies and are worth interning
+INTERNED_COLUMN_INDICES = tuple(MASTER_HEADERS.index(h) for h in ('Language', 'Genre', 'Distributor', 'Classification', 'Format'))
 
 # --- Scrape Settings (Optimized for API-like requests) ---
 MAX_MOVIES_TO_SCRAPE = None # Set to None to scrape all movies
 MAX_DAYS_TO_SCRAPE = 5      # Scrape a full week
-REQUEST_DELAY = 2           # Seconds to wait between most requests
+REQUESTS_PER_SECOND = 5     # Token-bucket rate limit shared by all requests
+MAX_CONCURRENT_MOVIES = 8   # Movies scraped in parallel
 SHEETS_CELL_CHAR_LIMIT = 49900 # Google Sheets limit is 50k, be safe
+TRUNCATION_MARKER = '...[TRUNCATED]' # Appended to cells cut at the limit
+MAX_CONNECTIONS = 32        # Size of the shared aiohttp connection pool
+KEEPALIVE_TIMEOUT = 60      # Seconds an idle connection is kept for reuse
+IMAGE_CHUNK_SIZE = 64 * 1024 # Bytes per chunk when streaming posters to disk
 
 # --- URL & Headers ---
 MOVIES_NOWSHOWING_URL = 'https://www.cinema.com.my/movies/nowshowing.aspx'
@@ -42,21 +66,56 @@ HTTP_HEADERS = {
     'Referer': 'https://www.cinema.com.my/'
 }
 
+# Shared parser that skips building nodes we never query: comments, processing
+# instructions, whitespace-only text and the id hash table (ids go via XPath).
+HTML_PARSER = lxml.html.HTMLParser(remove_blank_text=True, remove_comments=True, remove_pis=True, collect_ids=False)
+
+# --- CSS selectors, compiled to XPath once at import and evaluated in C by lxml ---
+MOVIE_LISTINGS_SELECTOR = CSSSelector('div.MovieWrap')
+LISTING_TITLE_SELECTOR = CSSSelector('.mov-lg a, .mov-sm a')
+DETAIL_ELEMENTS_SELECTOR = CSSSelector('.con-lg, #MovieSec .con-lg a, #ctl00_cphContent_imgPoster')
+DATE_OPTIONS_SELECTOR = CSSSelector('#ctl00_cphContent_ctl00_ddlShowdate option[value]:not([value=""])')
+SHOWTIMES_SELECTOR = CSSSelector('#ShowtimesList > a, #ShowtimesList > div')
+CINEMA_NAME_SELECTOR = CSSSelector('b')
+TIMES_SELECTOR = CSSSelector('div.showbox a, div.showbox')
+
+# --- XPath-only extractions (text nodes and attribute values) ---
+DESCRIPTION_XPATH = etree.XPath("text()[string-length(normalize-space(.)) > 50][1]")
+VIEWSTATE_XPATH = etree.XPath("string(//*[@id='__VIEWSTATE']/@value)")
+EVENTVALIDATION_XPATH = etree.XPath("string(//*[@id='__EVENTVALIDATION']/@value)")
+
+# --- Compiled metadata patterns for the movie detail page ---
+METADATA_KEYS = ('Language', 'Classification', 'Release Date', 'Genre', 'Running Time', 'Distributor', 'Cast', 'Director', 'Format')
+# Zero-width so a value that runs onto the next line cannot consume that line's key
+MASTER_META = re.compile(rf"^(?=({'|'.join(METADATA_KEYS)})\s*:\s*(.+)$)", re.MULTILINE | re.I)
+RUNNING_TIME_H = re.compile(r'(\d+)\s*Hours?', re.I)
+RUNNING_TIME_M = re.compile(r'(\d+)\s*Minutes?', re.I)
+VIEWSTATE_RE = re.compile(r'id="__VIEWSTATE"\s+value="([^"]*)"')
+EVENTVALIDATION_RE = re.compile(r'id="__EVENTVALIDATION"\s+value="([^"]*)"')
+DIV_TAG_RE = re.compile(r'<(/?)div\b', re.I)
+SHOWTIME_RE = re.compile(r'^(\d{1,2}):(\d{2})\s*([AP]M)?$', re.I)
+
 def get_malaysian_time() -> datetime:
     """Returns the current time in Malaysian timezone (GMT+8)."""
     return datetime.utcnow() + timedelta(hours=8)
 
 async def download_image(client, image_url: str, save_dir: str) -> str | None:
-    """Downloads an image asynchronously using the shared httpx client."""
+    """Streams an image into the (pre-created) save_dir using the shared HTTP client."""
     if not image_url or image_url == 'N/A': return None
     filename = os.path.basename(image_url)
-    os.makedirs(save_dir, exist_ok=True)
     full_save_path = os.path.join(save_dir, filename)
+    # Posters are only ever moved into place once fully written, so any
+    # non-empty file at the final path is a complete earlier download.
+    if os.path.exists(full_save_path) and os.path.getsize(full_save_path) > 0:
+        return full_save_path
+    partial_path = full_save_path + '.part'
     try:
-        response = await client.get(image_url, timeout=30.0)
-        response.raise_for_status()
-        with open(full_save_path, 'wb') as f:
-            f.write(response.content)
+        async with client.stream("GET", image_url, timeout=30.0) as response:
+            response.raise_for_status()
+            async with aiofiles.open(partial_path, 'wb') as f:
+                async for chunk in response.aiter_bytes(IMAGE_CHUNK_SIZE):
+                    await f.write(chunk)
+        os.replace(partial_path, full_save_path)
         return full_save_path
     except Exception as e:
         print(f"        Error downloading image {image_url}: {e}")
@@ -69,75 +128,186 @@ def get_master_worksheet(spreadsheet: gspread.Spreadsheet) -> gspread.Worksheet:
         return worksheet
     except gspread.WorksheetNotFound:
         print(f"Master worksheet '{MASTER_SHEET_NAME}' not found. Creating it.")
-        worksheet = spreadsheet.add_worksheet(title=MASTER_SHEET_NAME, rows=1, cols=17)
-        headers = ['Movie Title', 'Movie URL', 'Description', 'Running Time (Minutes)', 'Release Date (YYYY-MM-DD)', 'Language', 'Genre', 'Distributor', 'Classification', 'Cast', 'Director', 'Format', 'Cinema Count', 'Poster URL', 'Local Poster Path', 'Aggregated Showtimes Data', 'Scrape Date']
-        worksheet.append_row(headers)
+        worksheet = spreadsheet.add_worksheet(title=MASTER_SHEET_NAME, rows=1, cols=len(MASTER_HEADERS))
+        worksheet.append_row(MASTER_HEADERS)
         return worksheet
 
-def read_master_sheet(worksheet: gspread.Worksheet) -> dict[str, dict]:
+def read_master_sheet(worksheet: gspread.Worksheet) -> tuple[dict[str, dict], dict[str, int], bool] | None:
+    """
+    Reads the master sheet. Returns the records keyed by title, each title's
+    actual sheet row number, and whether the header row exists. Returns None
+    if the sheet could not be read.
+    """
     print("Reading data from master sheet...")
     try:
-        records = worksheet.get_all_records()
-        return {record['Movie Title']: record for record in records}
+        value_ranges = worksheet.spreadsheet.values_batch_get([MASTER_SHEET_RANGE]).get('valueRanges', [])
+        rows = value_ranges[0].get('values', []) if value_ranges else []
+        if not rows: return {}, {}, False
+        # The API drops trailing empty cells, so every header starts out as ''
+        headers = rows[0]
+        empty_record = dict.fromkeys(MASTER_HEADERS, '')
+        existing_data = {}
+        row_numbers = {}
+        for row_number, row in enumerate(rows[1:], start=2):
+            record = {**empty_record, **dict(zip(headers, row))}
+            title = record['Movie Title']
+            if not title: continue # Blank row
+            # Duplicate titles keep the last row, for both the record and its position
+            existing_data[title] = record
+            row_numbers[title] = row_number
+        return existing_data, row_numbers, True
     except Exception as e:
-        print(f"Could not read master sheet, assuming it's empty. Error: {e}")
-        return {}
+        print(f"Could not read master sheet. Error: {e}")
+        return None
+
+def serialize_row(record: dict, intern_pool: dict[str, str] | None = None) -> list[str]:
+    """
+    Converts a movie record holding every MASTER_HEADERS key into cell values.
+    If an intern_pool is given, repeated low-cardinality values share one string.
+    """
+    _str = str
+    values = ['' if v is None else _str(v) for v in MASTER_ROW_GETTER(record)]
+    if intern_pool is not None:
+        for i in INTERNED_COLUMN_INDICES: values[i] = intern_pool.setdefault(values[i], values[i])
+    return values
 
-def merge_data(existing_data: dict[str, dict], fresh_data: list[dict]) -> list[dict]:
+def merge_data(existing_data: dict[str, dict], row_numbers: dict[str, int], fresh_data: list[dict]) -> tuple[list[tuple[int, dict]], list[dict]]:
+    """
+    Merges fresh records into existing_data in place. Returns the existing rows
+    whose cell values changed as (sheet row number, record) pairs sorted by row,
+    and the new movies that need appending.
+    """
     print("Merging fresh data with existing records...")
-    updated_data = existing_data.copy()
+    changed_rows = {}
+    new_rows = []
     new_movies_count = 0
     updated_movies_count = 0
     for movie in fresh_data:
         title = movie['Movie Title']
-        if title in updated_data:
+        if (record := existing_data.get(title)) is not None:
             print(f"  Updating existing movie: {title}")
+            previous_values = serialize_row(record)
             for key, value in movie.items():
-                if value and value != 'N/A': updated_data[title][key] = value
-            updated_data[title]['Scrape Date'] = movie['Scrape Date']
+                if value and value != 'N/A': record[key] = value
+            record['Scrape Date'] = movie['Scrape Date']
+            if title in row_numbers and serialize_row(record) != previous_values:
+                changed_rows[row_numbers[title]] = record
             updated_movies_count += 1
         else:
             print(f"  Adding new movie: {title}")
-            updated_data[title] = movie
+            existing_data[title] = movie
+            new_rows.append(movie)
             new_movies_count += 1
-    print(f"Merge complete. Updated: {updated_movies_count}, New: {new_movies_count}")
-    return sorted(updated_data.values(), key=lambda x: x.get('Movie Title', ''))
+    print(f"Merge complete. Updated: {updated_movies_count} ({len(changed_rows)} changed), New: {new_movies_count}")
+    return sorted(changed_rows.items()), new_rows
 
-def update_master_sheet(worksheet: gspread.Worksheet, data: list[dict]):
-    if not data:
-        print("No data to write to master sheet.")
+def update_master_sheet(worksheet: gspread.Worksheet, changed_rows: list[tuple[int, dict]], new_rows: list[dict], has_header: bool = True):
+    if not changed_rows and not new_rows:
+        print("No changes to write to master sheet.")
         return
-    print(f"Updating master worksheet with {len(data)} records...")
+    print(f"Updating master worksheet: {len(changed_rows)} changed, {len(new_rows)} new records...")
     try:
-        worksheet.clear()
-        headers = ['Movie Title', 'Movie URL', 'Description', 'Running Time (Minutes)', 'Release Date (YYYY-MM-DD)', 'Language', 'Genre', 'Distributor', 'Classification', 'Cast', 'Director', 'Format', 'Cinema Count', 'Poster URL', 'Local Poster Path', 'Aggregated Showtimes Data', 'Scrape Date']
-        rows_to_write = [headers] + [[str(d.get(h, '')) for h in headers] for d in data]
-        worksheet.update(rows_to_write, value_input_option='USER_ENTERED')
+        # Each run of consecutive changed sheet rows becomes one range in a single batch
+        intern_pool = {}
+        data = []
+        for _, run in itertools.groupby(enumerate(changed_rows), key=lambda pair: pair[1][0] - pair[0]):
+            run = [row for _, row in run]
+            data.append({'range': f"'{MASTER_SHEET_NAME}'!A{run[0][0]}", 'values': [serialize_row(record, intern_pool) for _, record in run]})
+        if data:
+            worksheet.spreadsheet.values_batch_update({'valueInputOption': 'USER_ENTERED', 'data': data})
+        if new_rows:
+            # An empty sheet gets its header row first, so data never lands in row 1
+            rows_to_append = ([] if has_header else [MASTER_HEADERS]) + [serialize_row(d, intern_pool) for d in new_rows]
+            worksheet.append_rows(rows_to_append, value_input_option='USER_ENTERED')
         print("Master worksheet successfully updated.")
     except Exception as e:
         print(f"An error occurred while updating the master sheet: {e}")
 
-def parse_showtimes_from_html(soup: BeautifulSoup) -> dict:
-    """Parses the cinema and showtime data from a given HTML soup object."""
+def parse_showtimes_from_html(tree: lxml.html.HtmlElement) -> dict:
+    """Parses the cinema and showtime data from a given lxml HTML tree."""
     showtimes = {}
-    cinema_divs = soup.select('#ShowtimesList > a, #ShowtimesList > div')
+    cinema_divs = SHOWTIMES_SELECTOR(tree)
     current_cinema = 'N/A'
     for element in cinema_divs:
-        if element.name == 'a':
-            b_tag = element.find('b')
-            if b_tag:
-                current_cinema = b_tag.text.strip()
+        if element.tag == 'a':
+            b_tags = CINEMA_NAME_SELECTOR(element)
+            if b_tags:
+                current_cinema = b_tags[0].text_content().strip()
                 if current_cinema not in showtimes:
                     showtimes[current_cinema] = []
-        elif element.name == 'div':
-            times = [t.text.strip() for t in element.select('div.showbox a, div.showbox') if t.text.strip()]
+        elif element.tag == 'div':
+            times = [text for t in TIMES_SELECTOR(element) if (text := t.text_content().strip())]
             if times and current_cinema != 'N/A':
                 showtimes[current_cinema].extend(times)
-    # Remove duplicates
+    # Remove duplicates, keeping the cinema's own (chronological) order
     for cinema in showtimes:
-        showtimes[cinema] = sorted(list(set(showtimes[cinema])))
+        showtimes[cinema] = list(dict.fromkeys(showtimes[cinema]))
     return showtimes
 
+def parse_showtimes_fragment(html: str) -> dict | None:
+    """
+    Parses showtimes from a postback response by slicing out and parsing only
+    the #ShowtimesList <div>. Returns None when the page has no showtimes list.
+    """
+    marker = html.find('id="ShowtimesList"')
+    if marker == -1: return None
+    start = html.rfind('<', 0, marker)
+    if html[start:start + 4].lower() == '<div':
+        # Walk the div tags from the list's opening tag until they balance
+        depth = 0
+        for match in DIV_TAG_RE.finditer(html, start):
+            depth += -1 if match.group(1) else 1
+            if depth == 0:
+                end = html.find('>', match.end()) + 1
+                return parse_showtimes_from_html(lxml.html.fragment_fromstring(html[start:end], parser=HTML_PARSER))
+    # Unexpected markup: fall back to parsing the whole page
+    return parse_showtimes_from_html(lxml.html.fromstring(html, parser=HTML_PARSER))
+
+def extract_form_state(html: str, viewstate: str, eventvalidation: str) -> tuple[str, str]:
+    """Pulls the ASP.NET hidden fields from a raw response, keeping the given values for any that are missing."""
+    if new_viewstate := VIEWSTATE_RE.search(html): viewstate = new_viewstate.group(1)
+    if new_eventvalidation := EVENTVALIDATION_RE.search(html): eventvalidation = new_eventvalidation.group(1)
+    return viewstate, eventvalidation
+
+def encode_showtime(time_str: str) -> int | str:
+    """Encodes a showtime such as '1:30PM' or '13:30' as the 24-hour integer 1330."""
+    if not (m := SHOWTIME_RE.match(time_str)): return time_str
+    hours, minutes, meridiem = int(m.group(1)), int(m.group(2)), (m.group(3) or '').upper()
+    if meridiem == 'PM' and hours != 12: hours += 12
+    elif meridiem == 'AM' and hours == 12: hours = 0
+    return hours * 100 + minutes
+
+def encode_showtimes_data(cinemas: list[dict]) -> str:
+    """Encodes the compact cinema list into an 'Aggregated Showtimes Data' cell value."""
+    showtimes_json = orjson.dumps(cinemas) # Compact separators by default
+    # Large payloads are gzipped and base85-encoded to stay under the cell limit
+    if len(showtimes_json) > SHEETS_CELL_CHAR_LIMIT // 2:
+        return 'gz:' + base64.b85encode(gzip.compress(showtimes_json)).decode('ascii')
+    return showtimes_json.decode('utf-8')
+
+def decode_showtimes_data(cell: str) -> list[dict] | None:
+    """
+    Decodes an 'Aggregated Showtimes Data' cell into its list of cinemas, each
+    shaped {"c": name, "d": [dates], "t": [[HHMM, ...] per date]}. Returns []
+    for movies without showtimes ('N/A' or an empty cell) and None for cells
+    that were truncated to fit the sheet, since their data is incomplete.
+    """
+    if not cell or cell == 'N/A': return []
+    if cell.endswith(TRUNCATION_MARKER): return None
+    if cell.startswith('gz:'): return orjson.loads(gzip.decompress(base64.b85decode(cell[3:])))
+    return orjson.loads(cell)
+
+def build_showtimes_form_data(date_val: str, viewstate: str, eventvalidation: str) -> dict:
+    """Builds the ASP.NET postback form that selects a date in the showtimes dropdown."""
+    return {
+        '__EVENTTARGET': 'ctl00$cphContent$ctl00$ddlShowdate',
+        '__EVENTARGUMENT': '',
+        '__LASTFOCUS': '',
+        '__VIEWSTATE': viewstate,
+        '__EVENTVALIDATION': eventvalidation,
+        'ctl00$cphContent$ctl00$ddlShowdate': date_val,
+    }
+
 async def scrape_aggregated_showtimes(client: httpx.AsyncClient, showtimes_url: str) -> str:
     """
     Scrapes showtimes by reverse-engineering the ASP.NET form submissions
@@ -149,151 +319,196 @@ async def scrape_aggregated_showtimes(client: httpx.AsyncClient, showtimes_url:
         # 1. Initial GET request to get the first page and form data
         response = await client.get(showtimes_url, headers=HTTP_HEADERS)
         response.raise_for_status()
-        soup = BeautifulSoup(response.text, 'lxml')
+        tree = lxml.html.fromstring(response.text, parser=HTML_PARSER)
 
         # 2. Extract available dates and essential ASP.NET form fields
-        date_dropdown = soup.select_one('#ctl00_cphContent_ctl00_ddlShowdate')
-        if not date_dropdown: return 'N/A'
-        
-        date_options = [(opt.get('value'), opt.text) for opt in date_dropdown.find_all('option') if opt.get('value')]
+        date_options = [(opt.get('value'), opt.text_content()) for opt in DATE_OPTIONS_SELECTOR(tree)]
         date_options = date_options[:MAX_DAYS_TO_SCRAPE] if MAX_DAYS_TO_SCRAPE else date_options
 
-        viewstate = soup.select_one("#__VIEWSTATE").get("value") if soup.select_one("#__VIEWSTATE") else ""
-        eventvalidation = soup.select_one("#__EVENTVALIDATION").get("value") if soup.select_one("#__EVENTVALIDATION") else ""
+        viewstate = VIEWSTATE_XPATH(tree)
+        eventvalidation = EVENTVALIDATION_XPATH(tree)
 
         # 3. Process the first date (already loaded)
         if not date_options: return 'N/A'
         print(f"            Processing Date: {date_options[0][1]}")
-        first_date_showtimes = parse_showtimes_from_html(soup)
+        first_date_showtimes = parse_showtimes_from_html(tree)
         all_dates_data[date_options[0][1]] = first_date_showtimes
 
-        # 4. Loop through remaining dates, making POST requests
-        for i, (date_val, date_txt) in enumerate(date_options[1:]):
+        # 4. Fire the remaining date POSTs concurrently with the initial form
+        # state; ASP.NET usually accepts the same VIEWSTATE for every postback.
+        remaining_dates = date_options[1:]
+        responses = await asyncio.gather(*(client.post(showtimes_url, data=build_showtimes_form_data(date_val, viewstate, eventvalidation), headers=HTTP_HEADERS) for date_val, _ in remaining_dates), return_exceptions=True)
+
+        # Hidden form fields returned by each accepted postback, keyed by the
+        # date's position in date_options (0 is the initial GET)
+        form_states = {0: (viewstate, eventvalidation)}
+        rejected_dates = []
+        for position, ((date_val, date_txt), post_response) in enumerate(zip(remaining_dates, responses), start=1):
+            date_showtimes = parse_showtimes_fragment(post_response.text) if isinstance(post_response, httpx.Response) and post_response.status_code == 200 else None
+            if date_showtimes is None:
+                rejected_dates.append((position, date_val, date_txt))
+                continue
             print(f"            Processing Date: {date_txt}")
-            await asyncio.sleep(REQUEST_DELAY) # Be respectful to the server
-
-            form_data = {
-                '__EVENTTARGET': 'ctl00$cphContent$ctl00$ddlShowdate',
-                '__EVENTARGUMENT': '',
-                '__LASTFOCUS': '',
-                '__VIEWSTATE': viewstate,
-                '__EVENTVALIDATION': eventvalidation,
-                'ctl00$cphContent$ctl00$ddlShowdate': date_val,
-            }
-            
-            post_response = await client.post(showtimes_url, data=form_data, headers=HTTP_HEADERS)
+            all_dates_data[date_txt] = date_showtimes
+            form_states[position] = extract_form_state(post_response.text, viewstate, eventvalidation)
+
+        # 5. Fall back to the sequential VIEWSTATE chain for rejected dates: as
+        # in the original chain, each date is posted with the hidden fields from
+        # the preceding date's accepted response
+        for position, date_val, date_txt in rejected_dates:
+            if position - 1 not in form_states:
+                print("            No form state from the previous date. Stopping showtime scrape for this movie.")
+                break
+            print(f"            Processing Date (sequential): {date_txt}")
+            prev_viewstate, prev_eventvalidation = form_states[position - 1]
+            post_response = await client.post(showtimes_url, data=build_showtimes_form_data(date_val, prev_viewstate, prev_eventvalidation), headers=HTTP_HEADERS)
             
             if post_response.status_code != 200:
                 print(f"            Request failed with status {post_response.status_code}. Stopping showtime scrape for this movie.")
                 break
 
-            post_soup = BeautifulSoup(post_response.text, 'lxml')
-            
-            date_showtimes = parse_showtimes_from_html(post_soup)
+            # Only the showtimes fragment is parsed; the hidden form fields for
+            # the next postback are pulled straight from the raw response text
+            post_text = post_response.text
+            date_showtimes = parse_showtimes_fragment(post_text)
+            if date_showtimes is None:
+                print(f"            Postback rejected for {date_txt}. Stopping showtime scrape for this movie.")
+                break
             all_dates_data[date_txt] = date_showtimes
+            form_states[position] = extract_form_state(post_text, prev_viewstate, prev_eventvalidation)
 
-            new_viewstate = post_soup.select_one("#__VIEWSTATE")
-            if new_viewstate: viewstate = new_viewstate.get("value")
-            new_eventvalidation = post_soup.select_one("#__EVENTVALIDATION")
-            if new_eventvalidation: eventvalidation = new_eventvalidation.get("value")
+        # Keep the dates in dropdown order regardless of which path fetched them
+        all_dates_data = {date_txt: all_dates_data[date_txt] for _, date_txt in date_options if date_txt in all_dates_data}
 
-        # 5. Restructure the data into the final JSON format
+        # 6. Restructure the data into the compact per-cinema format, with
+        # parallel date ("d") and time ("t") arrays and times as HHMM ints
         final_json = []
         cinema_map = {}
         for date_str, cinemas in all_dates_data.items():
             for cinema_name, times in cinemas.items():
                 if cinema_name not in cinema_map:
-                    cinema_map[cinema_name] = {"cinemaName": cinema_name, "showings": []}
-                cinema_map[cinema_name]["showings"].append({"date": date_str, "times": times})
+                    cinema_map[cinema_name] = {"c": cinema_name, "d": [], "t": []}
+                cinema_map[cinema_name]["d"].append(date_str)
+                cinema_map[cinema_name]["t"].append([encode_showtime(t) for t in times])
         
         final_json = list(cinema_map.values())
-        return json.dumps(final_json, separators=(',', ':'))
+        return encode_showtimes_data(final_json)
 
     except Exception as e:
         print(f"          An error occurred in scrape_aggregated_showtimes: {e}")
         return 'N/A'
 
-async def main_scraper():
-    """Main function to run the lightweight scraper."""
-    print(f"Starting web scraping script v9.5 (Truncation Fix) at {get_malaysian_time()}...")
-    
-    # Setup Google Sheets
-    gc = gspread.service_account(filename=GOOGLE_SHEETS_CREDENTIALS)
-    spreadsheet = gc.open(GOOGLE_SHEET_NAME)
-    master_worksheet = get_master_worksheet(spreadsheet)
-    existing_movie_data = read_master_sheet(master_worksheet)
-    
-    scraped_records = []
-    
-    async with httpx.AsyncClient(follow_redirects=True) as client:
-        # 1. Get the main movie list
-        print(f"Fetching movie list from: {MOVIES_NOWSHOWING_URL}")
-        main_page_response = await client.get(MOVIES_NOWSHOWING_URL, headers=HTTP_HEADERS)
-        main_page_soup = BeautifulSoup(main_page_response.text, 'lxml')
-        movie_listings = main_page_soup.select('div.MovieWrap')
-        print(f"Found {len(movie_listings)} movie listings.")
-
-        # 2. Loop through each movie
-        for listing in movie_listings[:MAX_MOVIES_TO_SCRAPE]:
-            await asyncio.sleep(REQUEST_DELAY)
-            title_element = listing.select_one('.mov-lg a, .mov-sm a')
-            if not title_element: continue
-            
-            title = title_element.text.strip()
+def open_detail_cache() -> sqlite3.Connection:
+    """Opens the on-disk cache of parsed movie detail pages, keyed by URL."""
+    cache = sqlite3.connect(DETAIL_CACHE_PATH)
+    cache.execute("CREATE TABLE IF NOT EXISTS detail_cache (url TEXT PRIMARY KEY, etag TEXT, last_modified TEXT, body BLOB, parsed_json TEXT, fetched_at INTEGER)")
+    return cache
+
+def get_cached_detail(cache: sqlite3.Connection, url: str) -> tuple | None:
+    """Returns (etag, last_modified, parsed_json) for a cached detail page, if any."""
+    return cache.execute("SELECT etag, last_modified, parsed_json FROM detail_cache WHERE url = ?", (url,)).fetchone()
+
+def store_detail(cache: sqlite3.Connection, url: str, response: httpx.Response, details: dict):
+    """Stores a freshly fetched detail page together with its validators and parsed details."""
+    cache.execute(
+        "INSERT OR REPLACE INTO detail_cache VALUES (?, ?, ?, ?, ?, ?)",
+        (url, response.headers.get('ETag'), response.headers.get('Last-Modified'), response.content, orjson.dumps(details).decode('utf-8'), int(time.time())),
+    )
+    cache.commit()
+
+def parse_movie_details(tree: lxml.html.HtmlElement) -> dict | None:
+    """Extracts the description, metadata, poster URL and showtimes URL from a movie detail page."""
+    # Collect the container, poster and candidate showtimes links in one
+    # traversal of the tree, dispatching each match by id/class/tag
+    container = poster_element = None
+    possible_links = []
+    for element in DETAIL_ELEMENTS_SELECTOR(tree):
+        if element.get('id') == 'ctl00_cphContent_imgPoster':
+            if poster_element is None: poster_element = element
+        elif container is None and 'con-lg' in element.classes:
+            container = element
+        elif element.tag == 'a':
+            possible_links.append(element)
+    if container is None: return None
+
+    description = description_nodes[0].strip() if (description_nodes := DESCRIPTION_XPATH(container)) else 'N/A'
+
+    container_text = '\n'.join(container.itertext())
+
+    raw_metadata = {}
+    for match in MASTER_META.finditer(container_text):
+        raw_metadata.setdefault(match.group(1).title(), match.group(2).strip())
+    for k in METADATA_KEYS: raw_metadata.setdefault(k, 'N/A')
+
+    poster_url = poster_element.get('src') if poster_element is not None else 'N/A'
+
+    showtimes_url = None
+    for link in possible_links:
+        if "showtimes" in link.text_content().lower():
+            showtimes_url = f"{BASE_URL}{link.get('href')}"
+            break
+
+    return {'description': description, 'metadata': raw_metadata, 'poster_url': poster_url, 'showtimes_url': showtimes_url}
+
+async def process_movie(client: httpx.AsyncClient, listing: lxml.html.HtmlElement, sem: asyncio.Semaphore, cache: sqlite3.Connection, img_dir: str, now_str: str) -> dict | None:
+    """Scrapes the details, poster and showtimes of a single movie listing."""
+    async with sem:
+        try:
+            title_elements = LISTING_TITLE_SELECTOR(listing)
+            if not title_elements: return None
+
+            title_element = title_elements[0]
+            title = title_element.text_content().strip()
             movie_url = f"{BASE_URL}{title_element.get('href')}"
             print(f"      Processing movie: {title}")
 
-            # 3. Get movie details
-            detail_page_response = await client.get(movie_url, headers=HTTP_HEADERS)
-            detail_soup = BeautifulSoup(detail_page_response.text, 'lxml')
-            
-            container = detail_soup.select_one('.con-lg')
-            if not container: continue
-            
-            description = next((node.strip() for node in container.children if isinstance(node, str) and len(node.strip()) > 50), 'N/A')
+            # 1. Get movie details
+            # Revalidate cached pages with a conditional GET; on 304 reuse the
+            # previously parsed details instead of re-parsing the page
+            cached = get_cached_detail(cache, movie_url)
+            request_headers = dict(HTTP_HEADERS)
+            if cached:
+                etag, last_modified, _ = cached
+                if etag: request_headers['If-None-Match'] = etag
+                if last_modified: request_headers['If-Modified-Since'] = last_modified
+            detail_page_response = await client.get(movie_url, headers=request_headers)
+            if cached and detail_page_response.status_code != 200:
+                # 304 means unchanged; any other failure still has good cached details
+                if detail_page_response.status_code == 304: print("        Detail page unchanged, using cached details.")
+                else: print(f"        Detail page returned status {detail_page_response.status_code}, using cached details.")
+                details = orjson.loads(cached[2])
+            else:
+                details = parse_movie_details(lxml.html.fromstring(detail_page_response.text, parser=HTML_PARSER))
+                if details is None: return None
+                if detail_page_response.status_code == 200: store_detail(cache, movie_url, detail_page_response, details)
+
+            description, raw_metadata = details['description'], details['metadata']
             print(f"        Extracted Description: {description[:80]}...")
-            
-            container_text = container.get_text(separator='\n')
-            
-            def extract_metadata(p, t, flags=0): return (m.group(1).strip() if (m := re.search(p, t, flags)) else 'N/A')
-            
-            raw_metadata = {k: extract_metadata(f"^{k}\\s*:\\s*(.+)", container_text, re.MULTILINE | re.I) for k in ['Language', 'Classification', 'Release Date', 'Genre', 'Running Time', 'Distributor', 'Cast', 'Director', 'Format']}
-            
+
             rt_str = raw_metadata.get('Running Time', 'N/A')
-            h = int(h.group(1)) * 60 if (h := re.search(r'(\d+)\s*Hours?', rt_str, re.I)) else 0
-            m = int(m.group(1)) if (m := re.search(r'(\d+)\s*Minutes?', rt_str, re.I)) else 0
+            h = int(h.group(1)) * 60 if (h := RUNNING_TIME_H.search(rt_str)) else 0
+            m = int(m.group(1)) if (m := RUNNING_TIME_M.search(rt_str)) else 0
             total_minutes = h + m if h + m > 0 else 'N/A'
-            
+
             formatted_date = 'N/A'
             try:
                 formatted_date = datetime.strptime(raw_metadata.get('Release Date', 'N/A'), '%d %b %Y').strftime('%Y-%m-%d')
             except (ValueError, TypeError): pass
 
-            poster_url_element = detail_soup.select_one('#ctl00_cphContent_imgPoster')
-            poster_url = poster_url_element.get('src') if poster_url_element else 'N/A'
-            img_dir = os.path.join(BASE_IMAGE_DIR, get_malaysian_time().strftime('%Y_%m'))
+            poster_url = details['poster_url']
             local_poster_path = await download_image(client, poster_url, img_dir)
 
-            # 4. Get showtimes
+            # 2. Get showtimes
             showtimes_data = 'N/A'
-            
-            showtimes_link = None
-            possible_links = detail_soup.select('#MovieSec .con-lg a')
-            for link in possible_links:
-                if "showtimes" in link.text.lower():
-                    showtimes_link = link
-                    break
-            
-            if showtimes_link:
-                showtimes_url = f"{BASE_URL}{showtimes_link.get('href')}"
-                showtimes_data = await scrape_aggregated_showtimes(client, showtimes_url)
-            
+            if details['showtimes_url']:
+                showtimes_data = await scrape_aggregated_showtimes(client, details['showtimes_url'])
+
             # FIX: Truncate the data if it exceeds the Google Sheets cell limit
             if len(showtimes_data) > SHEETS_CELL_CHAR_LIMIT:
                 print(f"        WARNING: Showtime data for '{title}' is too long ({len(showtimes_data)} chars). Truncating.")
-                showtimes_data = showtimes_data[:SHEETS_CELL_CHAR_LIMIT] + "...[TRUNCATED]"
+                showtimes_data = showtimes_data[:SHEETS_CELL_CHAR_LIMIT] + TRUNCATION_MARKER
 
-            scraped_records.append({
+            return {
                 'Movie Title': title, 'Movie URL': movie_url, 'Description': description,
                 'Running Time (Minutes)': total_minutes, 'Release Date (YYYY-MM-DD)': formatted_date,
                 'Language': raw_metadata.get('Language', 'N/A'), 'Genre': raw_metadata.get('Genre', 'N/A'),
@@ -302,13 +517,56 @@ async def main_scraper():
                 'Format': raw_metadata.get('Format', 'N/A'), 'Cinema Count': 'N/A',
                 'Poster URL': poster_url, 'Local Poster Path': local_poster_path,
                 'Aggregated Showtimes Data': showtimes_data,
-                'Scrape Date': get_malaysian_time().strftime('%Y-%m-%d %H:%M:%S')
-            })
+                'Scrape Date': now_str
+            }
+        except Exception as e:
+            # One failed movie must not abort the whole concurrent run
+            print(f"      An error occurred while processing a movie listing: {e}")
+            return None
+
+async def main_scraper():
+    """Main function to run the lightweight scraper."""
+    now = get_malaysian_time()
+    now_str = now.strftime('%Y-%m-%d %H:%M:%S')
+    img_dir = os.path.join(BASE_IMAGE_DIR, now.strftime('%Y_%m'))
+    os.makedirs(img_dir, exist_ok=True)
+    print(f"Starting web scraping script v9.5 (Truncation Fix) at {now}...")
+    
+    # Setup Google Sheets
+    gc = gspread.service_account(filename=GOOGLE_SHEETS_CREDENTIALS)
+    spreadsheet = gc.open(GOOGLE_SHEET_NAME)
+    master_worksheet = get_master_worksheet(spreadsheet)
+    master_sheet = read_master_sheet(master_worksheet)
+    
+    # Politeness is enforced per request by the token bucket, so movies can
+    # be scraped concurrently without hammering the server.
+    limiter = AsyncLimiter(REQUESTS_PER_SECOND, 1)
+    async def throttle(request: httpx.Request): await limiter.acquire()
+    sem = asyncio.Semaphore(MAX_CONCURRENT_MOVIES)
+
+    # Route httpx through a pooled aiohttp session so TCP/TLS handshakes are
+    # amortized across every request of the run.
+    session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=MAX_CONNECTIONS, keepalive_timeout=KEEPALIVE_TIMEOUT))
+    async with httpx.AsyncClient(transport=AiohttpTransport(client=session), follow_redirects=True, event_hooks={'request': [throttle]}) as client, closing(open_detail_cache()) as cache:
+        # 1. Get the main movie list
+        print(f"Fetching movie list from: {MOVIES_NOWSHOWING_URL}")
+        main_page_response = await client.get(MOVIES_NOWSHOWING_URL, headers=HTTP_HEADERS)
+        main_page_tree = lxml.html.fromstring(main_page_response.text, parser=HTML_PARSER)
+        movie_listings = MOVIE_LISTINGS_SELECTOR(main_page_tree)
+        print(f"Found {len(movie_listings)} movie listings.")
 
-    # 5. Merge and update sheet
-    if scraped_records:
-        final_data = merge_data(existing_movie_data, scraped_records)
-        update_master_sheet(master_worksheet, final_data)
+        # 2. Scrape every movie concurrently, bounded by the semaphore
+        results = await asyncio.gather(*(process_movie(client, listing, sem, cache, img_dir, now_str) for listing in movie_listings[:MAX_MOVIES_TO_SCRAPE]))
+        scraped_records = [record for record in results if record]
+
+    # 3. Merge and update sheet
+    if master_sheet is None:
+        # Treating an unreadable sheet as empty would append every movie again
+        print("Master sheet could not be read. Skipping the update to avoid duplicating rows.")
+    elif scraped_records:
+        existing_movie_data, row_numbers, has_header = master_sheet
+        changed_rows, new_rows = merge_data(existing_movie_data, row_numbers, scraped_records)
+        update_master_sheet(master_worksheet, changed_rows, new_rows, has_header)
     else:
         print("No fresh data was scraped. Master sheet remains unchanged.")
 
@@ -0,0 +1,27 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scraper import SHEETS_CELL_CHAR_LIMIT, TRUNCATION_MARKER, decode_showtimes_data, encode_showtimes_data
+
+CINEMAS = [{"c": "GSC Mid Valley", "d": ["Wed, 15 Oct 2025"], "t": [[1100, 1330, "TBA"]]}]
+
+def test_plain_payload_round_trips():
+    cell = encode_showtimes_data(CINEMAS)
+    assert not cell.startswith('gz:')
+    assert decode_showtimes_data(cell) == CINEMAS
+
+def test_gzip_payload_round_trips():
+    cinemas = [{"c": f"Cinema {i}", "d": ["Wed, 15 Oct 2025", "Thu, 16 Oct 2025"], "t": [[1000 + i, 1200], [1400, 2100]]} for i in range(2000)]
+    cell = encode_showtimes_data(cinemas)
+    assert cell.startswith('gz:') and len(cell) <= SHEETS_CELL_CHAR_LIMIT
+    assert decode_showtimes_data(cell) == cinemas
+
+def test_missing_showtimes_decode_to_empty_list():
+    assert decode_showtimes_data('N/A') == []
+    assert decode_showtimes_data('') == []
+
+def test_truncated_cell_is_rejected():
+    cell = encode_showtimes_data(CINEMAS)[:20] + TRUNCATION_MARKER
+    assert decode_showtimes_data(cell) is None